@@ -14,9 +14,10 @@ import dataclasses
 import re
 import socket
 import ssl
+import sys
 import time
 from concurrent.futures import Future, ThreadPoolExecutor
-from typing import Iterator, Union
+from typing import Iterable, Iterator, Union
 
 import certifi
 
@@ -37,25 +38,45 @@ NICK_REGEX = r"[A-Za-z%s][A-Za-z0-9-%s]{0,15}" % (_special, _special)
 #                              Channel Name, exposes client bugs
 CHANNEL_REGEX = r"[&#+!][^ \x07,]{1,49}"
 
+_NICK_REGEX = re.compile(NICK_REGEX)
 
-def find_nicks(
-    text: str, self_nick: str, all_nicks: list[str]
-) -> Iterator[tuple[str, str | None]]:
-    lowercase_nicks = {n.lower() for n in all_nicks}
-    assert self_nick.lower() in lowercase_nicks
 
+def _find_lowercase_nicks(
+    text: str, lowercase_self_nick: str, lowercase_nicks: set[str]
+) -> Iterator[tuple[str, str | None]]:
     previous_end = 0
-    for match in re.finditer(NICK_REGEX, text):
-        if match.group(0).lower() in lowercase_nicks:
+    for match in _NICK_REGEX.finditer(text):
+        nick = match.group(0)
+        lowercase_nick = nick.lower()
+        if lowercase_nick in lowercase_nicks:
             yield (text[previous_end : match.start()], None)
-            if match.group(0).lower() == self_nick.lower():
-                yield (match.group(0), "self-nick")
+            if lowercase_nick == lowercase_self_nick:
+                yield (nick, "self-nick")
             else:
-                yield (match.group(0), "other-nick")
+                yield (nick, "other-nick")
             previous_end = match.end()
     yield (text[previous_end:], None)
 
 
+# Takes text split into (substring, tags) pairs, and splits it further so that
+# nicks are separate substrings with "self-nick" or "other-nick" tag added.
+# Lowercases the nicks only once, no matter how many substrings there are.
+def find_nicks_in_parts(
+    parts: Iterable[tuple[str, list[str]]], self_nick: str, all_nicks: Iterable[str]
+) -> Iterator[tuple[str, list[str]]]:
+    lowercase_self_nick = self_nick.lower()
+    lowercase_nicks = {n.lower() for n in all_nicks}
+    assert lowercase_self_nick in lowercase_nicks
+
+    for text, tags in parts:
+        for substring, nick_tag in _find_lowercase_nicks(
+            text, lowercase_self_nick, lowercase_nicks
+        ):
+            # Empty substrings appear e.g. after a nick at the end of the text
+            if substring:
+                yield (substring, tags if nick_tag is None else tags + [nick_tag])
+
+
 RECONNECT_SECONDS = 5
 
 IDLE_BEFORE_PING_SECONDS = 60
@@ -388,6 +409,10 @@ class IrcCore:
             sender, command, *args = line.split(" ")
             sender = sender[1:]
 
+        # Commands and nicks are compared a lot with other strings. Comparing
+        # interned strings is fast when they are equal, and nicks repeat a lot.
+        command = sys.intern(command)
+
         for n, arg in enumerate(args):
             if arg.startswith(":"):
                 temp = args[:n]
@@ -397,7 +422,7 @@ class IrcCore:
 
         if sender is not None and "!" in sender:
             return MessageFromUser(
-                sender_nick=sender.split("!")[0],
+                sender_nick=sys.intern(sender.split("!")[0]),
                 sender_user_mask=sender,
                 command=command,
                 args=args,
@@ -9,6 +9,8 @@ from typing import Callable
 from mantaray.backend import IrcCore
 from mantaray.views import ChannelView, PMView, View
 
+_COMMAND_REGEX = re.compile(r"/[A-Za-z]+( .*)?")
+
 
 def _send_privmsg(
     view: View, core: IrcCore, message: str, *, history_id: int | None = None
@@ -29,7 +31,7 @@ def handle_command(view: View, core: IrcCore, entry_text: str, history_id: int)
     if not entry_text:
         return
 
-    if re.fullmatch("/[A-Za-z]+( .*)?", entry_text):
+    if _COMMAND_REGEX.fullmatch(entry_text):
         try:
             func = _commands[entry_text.split()[0].lower()]
         except KeyError:
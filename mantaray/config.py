@@ -37,6 +37,10 @@ class Settings:
         self.userlist_width = 150
         self.theme = "dark"
 
+        # Contents of config.json as it was last saved, used to skip writing
+        # the file when nothing has changed.
+        self._last_saved_json: str | None = None
+
     def add_server(self, server_settings: ServerSettings) -> None:
         assert server_settings.parent_settings_object is None
         server_settings.parent_settings_object = self
@@ -83,10 +87,14 @@ class Settings:
         if self.read_only:
             return
 
+        json_string = json.dumps(self.get_json(), indent=2) + "\n"
+        if json_string == self._last_saved_json:
+            return
+
         self._config_dir.mkdir(parents=True, exist_ok=True)
         with (self._config_dir / "config.json").open("w", encoding="utf-8") as file:
-            json.dump(self.get_json(), file, indent=2)
-            file.write("\n")
+            file.write(json_string)
+        self._last_saved_json = json_string
 
         # config.json contains passwords (hexchat stores them in plain text too)
         # TODO: how do permissions work on windows?
@@ -12,11 +12,16 @@ from mantaray import commands, config, logs
 from mantaray.right_click_menus import (
     RIGHT_CLICK_BINDINGS,
     channel_view_right_click,
+    create_empty_view_selector_menu,
+    empty_view_selector_right_click,
     pm_view_right_click,
-    server_right_click,
+    server_view_right_click,
 )
 from mantaray.views import AWAY_COLOR, ChannelView, PMView, ServerView, View
 
+# "foo bar Ali" --> ("foo bar ", "Ali")
+_AUTOCOMPLETE_REGEX = re.compile(r"(.*\s)?([^\s:]+):? ?")
+
 
 def _fix_tag_coloring_bug() -> None:
     # https://stackoverflow.com/a/60949800
@@ -94,21 +99,19 @@ class IrcWidget(ttk.PanedWindow):
     ):
         super().__init__(master, orient="horizontal")
         self.settings = settings
+        self._save_settings_timeout_id: str | None = None
+        self._save_widths_timeout_id: str | None = None
         self.log_manager = logs.LogManager(log_dir)
+        self._flush_logs_timeout_id = self.after(1000, self._flush_logs)
         self.verbose = verbose
         self._after_quitting_all_servers = after_quitting_all_servers
 
-        images_dir = Path(__file__).absolute().parent / "images"
-        self.channel_image = tkinter.PhotoImage(
-            file=(images_dir / "hashtagbubble-20x20.png")
-        )
-        self.pm_image = tkinter.PhotoImage(file=(images_dir / "face-20x20.png"))
+        # Loaded when first needed
+        self._channel_image: tkinter.PhotoImage | None = None
+        self._pm_image: tkinter.PhotoImage | None = None
 
         # Help Python's GC (tkinter images rely on __del__ and it sucks)
-        self.bind(
-            "<Destroy>", (lambda e: setattr(self, "channel_image", None)), add=True
-        )
-        self.bind("<Destroy>", (lambda e: setattr(self, "pm_image", None)), add=True)
+        self.bind("<Destroy>", self._forget_images, add=True)
 
         _fix_tag_coloring_bug()
 
@@ -122,17 +125,34 @@ class IrcWidget(ttk.PanedWindow):
         self.add(self.view_selector, weight=0)  # don't stretch
 
         self._previous_view: View | None = None
+        self._current_is_channel = False  # True when user list is showing
         self.view_selector.bind("<<TreeviewSelect>>", self._current_view_changed)
 
+        # Shown when right-clicking the view selector, but not on any view
+        self.empty_view_selector_menu = create_empty_view_selector_menu(self)
         for right_click in RIGHT_CLICK_BINDINGS:
             self.view_selector.bind(right_click, self.on_view_selector_right_click)
 
         self.textwidget_container = ttk.Frame(self)
         self.add(self.textwidget_container, weight=1)  # always stretch
 
+        # Contains the user list of the current channel. Added to the panedwindow
+        # only when a channel is selected, so that switching from one channel to
+        # another doesn't need to remove and add panes.
+        self.userlist_frame = ttk.Frame(self)
+
         entryframe = ttk.Frame(self.textwidget_container)
         entryframe.pack(side="bottom", fill="x")
 
+        # Text widgets of all views are gridded into the same cell here, but
+        # only the current view's text widget is shown. The others are hidden
+        # with grid_remove(), so that they don't need geometry or redraw work
+        # when messages arrive. grid() shows them again with the same options.
+        self.textwidget_frame = ttk.Frame(self.textwidget_container)
+        self.textwidget_frame.pack(side="top", fill="both", expand=True)
+        self.textwidget_frame.grid_rowconfigure(0, weight=1)
+        self.textwidget_frame.grid_columnconfigure(0, weight=1)
+
         # TODO: add a tooltip to the button, it's not very obvious
         self.nickbutton = ttk.Button(entryframe, command=self._show_change_nick_dialog)
         self.nickbutton.pack(side="left")
@@ -148,13 +168,26 @@ class IrcWidget(ttk.PanedWindow):
         self.entry.bind("<Tab>", self._tab_event_handler)
         self.entry.bind("<Prior>", self._scroll_up)
         self.entry.bind("<Next>", self._scroll_down)
+        self.entry.bind("<Up>", self._previous_history_item)
+        self.entry.bind("<Down>", self._next_history_item)
 
         self.views_by_id: dict[str, View] = {}
-        for server_config in self.settings.servers:
-            self._create_and_add_server_view(server_config)
-
-        self.bind("<Button1-Motion>", self._save_widths, add=True)
+        # Same as view_selector.get_children(parent_id), without asking Tcl
+        self._children: dict[str, list[str]] = {"": []}
+        # Set to None whenever _children changes
+        self._flat_item_ids_cache: tuple[list[str], dict[str, int]] | None = None
+        # Select only once, instead of switching views for each server
+        server_views = [ServerView(self, s) for s in self.settings.servers]
+        for view in server_views:
+            self.add_view(view, select=False)
+        if server_views:
+            self.view_selector.selection_set(server_views[-1].view_id)
+        for view in server_views:
+            view.start_running()  # Must be after add_view() and selecting a view
+
+        self.bind("<Button1-Motion>", self._save_widths_soon, add=True)
         self.view_selector.bind("<Map>", self._get_widths_from_settings_soon, add=True)
+        self.userlist_frame.bind("<Map>", self._get_widths_from_settings_soon, add=True)
 
     def get_current_view(self) -> View:
         [view_id] = self.view_selector.selection()
@@ -162,13 +195,18 @@ class IrcWidget(ttk.PanedWindow):
 
     # for tests
     def text(self) -> str:
-        return self.get_current_view().textwidget.get("1.0", "end - 1 char")
+        return self.get_current_view().textwidget.get("1.0", "end-1c")
+
+    # Faster than view_selector.get_children(). Don't mutate the returned list.
+    def get_child_view_ids(self, parent_id: str) -> list[str]:
+        return self._children[parent_id]
 
     def get_server_views(self) -> list[ServerView]:
-        server_views = [
-            v for v in self.views_by_id.values() if isinstance(v, ServerView)
-        ]
-        server_views.sort(key=(lambda v: self.view_selector.index(v.view_id)))
+        server_views = []
+        for view_id in self._children[""]:
+            view = self.views_by_id[view_id]
+            assert isinstance(view, ServerView)
+            server_views.append(view)
         return server_views
 
     def _show_change_nick_dialog(self) -> None:
@@ -177,6 +215,26 @@ class IrcWidget(ttk.PanedWindow):
         if new_nick != server_view.settings.nick:
             server_view.core.send(f"NICK {new_nick}")
 
+    def _forget_images(self, junk_event: object) -> None:
+        self._channel_image = None
+        self._pm_image = None
+
+    def _load_image(self, filename: str) -> tkinter.PhotoImage:
+        images_dir = Path(__file__).absolute().parent / "images"
+        return tkinter.PhotoImage(file=(images_dir / filename))
+
+    @property
+    def channel_image(self) -> tkinter.PhotoImage:
+        if self._channel_image is None:
+            self._channel_image = self._load_image("hashtagbubble-20x20.png")
+        return self._channel_image
+
+    @property
+    def pm_image(self) -> tkinter.PhotoImage:
+        if self._pm_image is None:
+            self._pm_image = self._load_image("face-20x20.png")
+        return self._pm_image
+
     def on_enter_pressed(self, junk_event: object = None) -> None:
         view = self.get_current_view()
         entry_text, history_id = view.history.get_text_and_clear_entry()
@@ -188,87 +246,111 @@ class IrcWidget(ttk.PanedWindow):
     def _scroll_down(self, junk_event: object) -> None:
         self.get_current_view().textwidget.yview_scroll(1, "pages")
 
+    def _previous_history_item(self, junk_event: object) -> None:
+        self.get_current_view().history.previous()
+
+    def _next_history_item(self, junk_event: object) -> None:
+        self.get_current_view().history.next()
+
+    # Use this when the settings may change many times in a row, e.g. moving views
+    # or holding down the font size key. The settings are written to config.json
+    # only once.
+    def save_settings_soon(self) -> None:
+        if self._save_settings_timeout_id is None:
+            self._save_settings_timeout_id = self.after(250, self._save_settings_now)
+
+    def _save_settings_now(self) -> None:
+        if self._save_settings_timeout_id is not None:
+            self.after_cancel(self._save_settings_timeout_id)
+            self._save_settings_timeout_id = None
+        self.settings.save()
+
     def bigger_font_size(self) -> None:
         self.settings.font["size"] += 1
-        self.settings.save()
+        self.save_settings_soon()
 
     def smaller_font_size(self) -> None:
         if self.settings.font["size"] > 3:
             self.settings.font["size"] -= 1
-            self.settings.save()
-
-    def _get_flat_list_of_item_ids(self) -> list[str]:
-        result = []
-        for server_id in self.view_selector.get_children(""):
-            result.append(server_id)
-            result.extend(self.view_selector.get_children(server_id))
-        return result
+            self.save_settings_soon()
+
+    # Returns item IDs in the order they are shown in the view selector, and a
+    # dict for looking up the index of an item ID in that list.
+    def _get_flat_list_of_item_ids(self) -> tuple[list[str], dict[str, int]]:
+        if self._flat_item_ids_cache is None:
+            ids = []
+            for server_id in self._children[""]:
+                ids.append(server_id)
+                ids.extend(self._children[server_id])
+            self._flat_item_ids_cache = (ids, {id: i for i, id in enumerate(ids)})
+        return self._flat_item_ids_cache
 
     def select_by_number(self, index: int) -> None:
-        ids = self._get_flat_list_of_item_ids()
+        ids, indexes = self._get_flat_list_of_item_ids()
         try:
             self.view_selector.selection_set(ids[index])
         except IndexError:
             pass
 
     def select_previous_view(self) -> None:
-        ids = self._get_flat_list_of_item_ids()
-        index = ids.index(self.get_current_view().view_id) - 1
+        ids, indexes = self._get_flat_list_of_item_ids()
+        index = indexes[self.get_current_view().view_id] - 1
         if index >= 0:
             self.view_selector.selection_set(ids[index])
 
     def select_next_view(self) -> None:
-        ids = self._get_flat_list_of_item_ids()
-        index = ids.index(self.get_current_view().view_id) + 1
+        ids, indexes = self._get_flat_list_of_item_ids()
+        index = indexes[self.get_current_view().view_id] + 1
         if index < len(ids):
             self.view_selector.selection_set(ids[index])
 
     def _select_another_view(self, bad_view: View) -> None:
         if self.get_current_view() == bad_view:
-            ids = self._get_flat_list_of_item_ids()
-            index = ids.index(bad_view.view_id)
+            ids, indexes = self._get_flat_list_of_item_ids()
+            index = indexes[bad_view.view_id]
             if index == 0:
                 self.view_selector.selection_set(ids[1])
             else:
                 self.view_selector.selection_set(ids[index - 1])
 
-    def move_view_up(self) -> None:
-        view_id = self.get_current_view().view_id
-        self.view_selector.move(
-            view_id,
-            self.view_selector.parent(view_id),
-            self.view_selector.index(view_id) - 1,
-        )
+    def _move_current_view(self, offset: int) -> None:
+        view = self.get_current_view()
+        parent_id = "" if isinstance(view, ServerView) else view.server_view.view_id
+        siblings = self._children[parent_id]
+        old_index = siblings.index(view.view_id)
+        new_index = old_index + offset
+        if new_index < 0 or new_index >= len(siblings):
+            return
+
+        siblings.insert(new_index, siblings.pop(old_index))
+        self._flat_item_ids_cache = None
+        if not isinstance(view, ServerView):
+            view.server_view.subviews_cache.clear()
+        self.view_selector.move(view.view_id, parent_id, new_index)
         self.sort_settings_according_to_gui()
 
+    def move_view_up(self) -> None:
+        self._move_current_view(-1)
+
     def move_view_down(self) -> None:
-        view_id = self.get_current_view().view_id
-        self.view_selector.move(
-            view_id,
-            self.view_selector.parent(view_id),
-            self.view_selector.index(view_id) + 1,
-        )
-        self.sort_settings_according_to_gui()
+        self._move_current_view(1)
 
     def sort_settings_according_to_gui(self) -> None:
-        servers_in_gui = [view.settings for view in self.get_server_views()]
-        self.settings.servers.sort(key=servers_in_gui.index)
-
-        for server_view in self.get_server_views():
-            channels_in_gui = [
-                view.channel_name
-                for view in server_view.get_subviews()
+        server_views = self.get_server_views()
+        server_indexes = {id(view.settings): i for i, view in enumerate(server_views)}
+        self.settings.servers.sort(key=(lambda s: server_indexes[id(s)]))
+
+        for server_view in server_views:
+            channel_indexes = {
+                view.channel_name: i
+                for i, view in enumerate(server_view.get_subviews())
                 if isinstance(view, ChannelView)
-            ]
+            }
             server_view.settings.joined_channels.sort(
-                key=(
-                    lambda c: (
-                        channels_in_gui.index(c) if c in channels_in_gui else 1000000
-                    )
-                )
+                key=(lambda c: channel_indexes.get(c, 1000000))
             )
 
-        self.settings.save()
+        self.save_settings_soon()
 
     def _tab_event_handler(self, junk_event: object) -> str:
         self.autocomplete()
@@ -281,61 +363,75 @@ class IrcWidget(ttk.PanedWindow):
             return
 
         cursor_pos = self.entry.index("insert")
-        match = re.fullmatch(r"(.*\s)?([^\s:]+):? ?", self.entry.get()[:cursor_pos])
+        text_before_cursor = self.entry.get()[:cursor_pos]
+        match = _AUTOCOMPLETE_REGEX.fullmatch(text_before_cursor)
         if match is None:
             return
         preceding_text, last_word = match.groups()  # preceding_text can be None
 
-        nicks = view.userlist.get_nicks()
-        if last_word in nicks:
-            completion = nicks[(nicks.index(last_word) + 1) % len(nicks)]
-        else:
-            try:
-                completion = next(
-                    username
-                    for username in nicks
-                    if username.lower().startswith(last_word.lower())
-                )
-            except StopIteration:
-                return
+        completion = view.userlist.find_next_nick(last_word)
+        if completion is None:
+            completion = view.userlist.find_nick_by_prefix(last_word)
+        if completion is None:
+            return
 
         if preceding_text:
             new_text = preceding_text + completion + " "
         else:
             new_text = completion + ": "
+        if new_text == text_before_cursor:
+            # e.g. only one matching nick, and it has already been completed
+            return
         self.entry.delete(0, cursor_pos)
         self.entry.insert(0, new_text)
         self.entry.icursor(len(new_text))
 
     def _current_view_changed(self, event: object) -> None:
-        new_view = self.get_current_view()
-        if self._previous_view == new_view:
+        # <<TreeviewSelect>> also fires when the selection didn't really change
+        selection = self.view_selector.selection()
+        if not selection:
+            return
+        [view_id] = selection
+        if self._previous_view is not None and self._previous_view.view_id == view_id:
             return
+        new_view = self.views_by_id[view_id]
 
-        if (
-            isinstance(self._previous_view, ChannelView)
-            and self._previous_view.userlist.treeview.winfo_exists()
-        ):
-            self.remove(self._previous_view.userlist.treeview)
+        if isinstance(self._previous_view, ChannelView):
+            if self._previous_view.userlist.treeview.winfo_exists():
+                self._previous_view.userlist.treeview.pack_forget()
+            if not isinstance(new_view, ChannelView):
+                self.remove(self.userlist_frame)
         if isinstance(new_view, ChannelView):
-            self.add(new_view.userlist.treeview, weight=0)
+            new_view.userlist.treeview.pack(fill="both", expand=True)
+            if not isinstance(self._previous_view, ChannelView):
+                self.add(self.userlist_frame, weight=0)
 
         if (
             self._previous_view is not None
             and self._previous_view.textwidget.winfo_exists()
         ):
-            self._previous_view.textwidget.pack_forget()
-        new_view.textwidget.pack(side="top", fill="both", expand=True)
+            self._previous_view.textwidget.grid_remove()
+        new_view.textwidget.grid()
         new_view.mark_seen()
         new_view.history.use_entry(self.entry)
 
         self._previous_view = new_view
+        self._current_is_channel = isinstance(new_view, ChannelView)
 
         self.update_nick_button()
         self.entry.focus()
 
-    def update_nick_button(self) -> None:
-        server_view = self.get_current_view().server_view
+    # If changed_server_view is given, the button is updated only if it's showing
+    # the nick of that server.
+    def update_nick_button(self, changed_server_view: ServerView | None = None) -> None:
+        # Don't use get_current_view(), because it asks Tcl for the selection.
+        # If the selection changed, _current_view_changed() will update the button.
+        if self._previous_view is None:
+            return
+        server_view = self._previous_view.server_view
+        if changed_server_view is not None and changed_server_view is not server_view:
+            return
+
         if server_view.core.is_away:
             self.nickbutton.config(
                 text=server_view.settings.nick + " (away)", style="Away.TButton"
@@ -343,15 +439,19 @@ class IrcWidget(ttk.PanedWindow):
         else:
             self.nickbutton.config(text=server_view.settings.nick, style="")
 
-    def add_view(self, view: View) -> None:
+    def add_view(self, view: View, *, select: bool = True) -> None:
         assert view.view_id not in self.views_by_id
         self.view_selector.item(view.server_view.view_id, open=True)
         self.views_by_id[view.view_id] = view
-        self.view_selector.selection_set(view.view_id)
-        if isinstance(view, ChannelView):
-            view.userlist.treeview.bind(
-                "<Map>", self._get_widths_from_settings_soon, add=True
-            )
+        if isinstance(view, ServerView):
+            self._children[""].append(view.view_id)
+            self._children[view.view_id] = []
+        else:
+            self._children[view.server_view.view_id].append(view.view_id)
+            view.server_view.subviews_cache.clear()
+        self._flat_item_ids_cache = None
+        if select:
+            self.view_selector.selection_set(view.view_id)
 
     def _create_and_add_server_view(self, settings: config.ServerSettings) -> None:
         view = ServerView(self, settings)
@@ -360,6 +460,9 @@ class IrcWidget(ttk.PanedWindow):
 
     def remove_view(self, view: ChannelView | PMView) -> None:
         self._select_another_view(view)
+        self._children[view.server_view.view_id].remove(view.view_id)
+        view.server_view.subviews_cache.clear()
+        self._flat_item_ids_cache = None
         self.view_selector.delete(view.view_id)
         view.close_log_file()
         view.destroy_widgets()
@@ -375,16 +478,24 @@ class IrcWidget(ttk.PanedWindow):
             assert isinstance(subview, (ChannelView, PMView))
             self.remove_view(subview)
 
-        is_last = len(self.view_selector.get_children("")) == 1
+        is_last = len(self._children[""]) == 1
         if not is_last:
             self._select_another_view(server_view)
 
+        self._children[""].remove(server_view.view_id)
+        del self._children[server_view.view_id]
+        self._flat_item_ids_cache = None
         self.view_selector.delete(server_view.view_id)
         server_view.close_log_file()
         server_view.destroy_widgets()
         del self.views_by_id[server_view.view_id]
 
         if is_last:
+            self.after_cancel(self._flush_logs_timeout_id)
+            if self._save_widths_timeout_id is not None:
+                self.after_cancel(self._save_widths_timeout_id)
+            if self._save_settings_timeout_id is not None:
+                self._save_settings_now()
             self.destroy()
             if self._after_quitting_all_servers is not None:
                 self._after_quitting_all_servers()
@@ -398,7 +509,7 @@ class IrcWidget(ttk.PanedWindow):
         )
         if user_clicked_connect:
             self.settings.add_server(server_settings)
-            self.settings.save()
+            self.save_settings_soon()
             self._create_and_add_server_view(server_settings)
 
     def leave_server(self, view: ServerView) -> None:
@@ -425,36 +536,45 @@ class IrcWidget(ttk.PanedWindow):
         ):
             view.core.quit()
             self.settings.servers.remove(view.settings)
-            self.settings.save()
+            self.save_settings_soon()
 
     def on_view_selector_right_click(self, event: tkinter.Event[ttk.Treeview]) -> None:
         item_id = self.view_selector.identify_row(event.y)
         if item_id:
             self.view_selector.selection_set(item_id)
-            view = self.get_current_view()
-        else:
-            view = None
-
-        if view is None or isinstance(view, ServerView):
-            server_right_click(event, self, view)
-        elif isinstance(view, ChannelView):
-            channel_view_right_click(event, view)
-        elif isinstance(view, PMView):
-            pm_view_right_click(event, view)
+            view = self.views_by_id[item_id]
+            if isinstance(view, ServerView):
+                server_view_right_click(event, view)
+            elif isinstance(view, ChannelView):
+                channel_view_right_click(event, view)
+            elif isinstance(view, PMView):
+                pm_view_right_click(event, view)
+            else:
+                raise NotImplementedError(view)
         else:
-            raise NotImplementedError(view)
+            empty_view_selector_right_click(event, self)
 
-    def _save_widths(self, junk_event: object = None) -> None:
+    def _flush_logs(self) -> None:
+        self.log_manager.flush_all()
+        self._flush_logs_timeout_id = self.after(1000, self._flush_logs)
+
+    # Dragging a sash generates lots of motion events
+    def _save_widths_soon(self, junk_event: object = None) -> None:
+        if self._save_widths_timeout_id is None:
+            self._save_widths_timeout_id = self.after(150, self._save_widths)
+
+    def _save_widths(self) -> None:
+        self._save_widths_timeout_id = None
         self.settings.view_selector_width = self.sashpos(0)
-        if isinstance(self.get_current_view(), ChannelView):
+        if self._current_is_channel:
             self.settings.userlist_width = self.winfo_width() - self.sashpos(1)
-        self.settings.save()
+        self.save_settings_soon()
 
     def _get_widths_from_settings_soon(self, junk_event: object = None) -> None:
         self.after_idle(self._get_widths_from_settings)
 
     def _get_widths_from_settings(self) -> None:
         self.sashpos(0, self.settings.view_selector_width)
-        if isinstance(self.get_current_view(), ChannelView):
+        if self._current_is_channel:
             # there is a user list
             self.sashpos(1, self.winfo_width() - self.settings.userlist_width)
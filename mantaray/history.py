@@ -18,18 +18,11 @@ class History:
         self._index = 0
 
         self._text_var = tkinter.StringVar()
-        self._text_var.trace_add("write", self._update_history)
         self._textwidget = textwidget
 
-    def _update_history(self, *junk: object) -> None:
-        # Allow changing only the last (not yet enter pressed) item
-        if self._index == len(self._items) - 1:
-            self._items[-1].entry_text = self._text_var.get()
-
+    # The entry's <Up> and <Down> bindings should call previous() and next()
     def use_entry(self, entry: tkinter.Entry) -> None:
         entry.config(textvariable=self._text_var)
-        entry.bind("<Up>", self.previous)
-        entry.bind("<Down>", self.next)
 
     def _select_current_item(self) -> None:
         item = self._items[self._index]
@@ -49,6 +42,10 @@ class History:
 
     def previous(self, junk_event: object = None) -> None:
         if self._index > 0:
+            # Allow changing only the last (not yet enter pressed) item. Its text
+            # is saved here instead of on every keystroke.
+            if self._index == len(self._items) - 1:
+                self._items[-1].entry_text = self._text_var.get()
             self._index -= 1
             self._select_current_item()
 
@@ -1,24 +1,40 @@
-import re
+import string
 import sys
 import time
 from pathlib import Path
-from typing import IO
+from typing import IO, Dict
+
+_SAFE_CHARS = set(string.ascii_letters + string.digits + "-_#")
+
+
+# Table for str.translate(), replaces unsafe characters with underscores.
+# Filled as characters are looked up, because there are lots of unicode chars.
+# Not dict[int, str], because subscripting dict fails at runtime on Python 3.8
+class _SafeTranslationTable(Dict[int, str]):
+    def __missing__(self, char_code: int) -> str:
+        char = chr(char_code)
+        self[char_code] = char if char in _SAFE_CHARS else "_"
+        return self[char_code]
+
+
+_safe_table = _SafeTranslationTable()
 
 
 class LogManager:
     def __init__(self, log_dir: Path):
         self.log_dir = log_dir
         self._opened: dict[IO[str], Path] = {}
+        self._opened_paths: set[Path] = set()  # same as self._opened.values()
 
     def open_log_file(self, server_name: str, channel_or_nick: str) -> IO[str]:
-        safe_folder = re.sub("[^A-Za-z0-9-_#]", "_", server_name.lower())
-        safe_file = re.sub("[^A-Za-z0-9-_#]", "_", channel_or_nick.lower())
+        safe_folder = server_name.lower().translate(_safe_table)
+        safe_file = channel_or_nick.lower().translate(_safe_table)
 
         # Even if someone's nickname is "server", logs shouldn't get mixed.
         # The actual server.log is created first.
         n = 1
         path = self.log_dir / safe_folder / f"{safe_file}.log"
-        while path in self._opened.values():
+        while path in self._opened_paths:
             n += 1
             path = self.log_dir / safe_folder / f"{safe_file}({n}).log"
 
@@ -29,9 +45,16 @@ class LogManager:
 
         print("\n\n*** LOGGING BEGINS", time.asctime(), file=file, flush=True)
         self._opened[file] = path
+        self._opened_paths.add(path)
         return file
 
+    # Messages aren't flushed as they are logged, because that would be slow
+    # in busy channels. Call this every now and then instead.
+    def flush_all(self) -> None:
+        for file in self._opened:
+            file.flush()
+
     def close_log_file(self, file: IO[str]) -> None:
         print("*** LOGGING ENDS", time.asctime(), file=file, flush=True)
         file.close()
-        del self._opened[file]
+        self._opened_paths.remove(self._opened.pop(file))
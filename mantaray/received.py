@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+import collections
 import re
 from base64 import b64encode
+from typing import Any, Callable
 
 from mantaray import backend, textwidget_tags, views
 
@@ -37,31 +39,38 @@ RPL_TOPIC = "332"
 
 ERR_SASLFAIL = "904"
 
-WHOIS_REPLY_CODES = {
-    RPL_WHOISCERTFP,
-    RPL_WHOISREGNICK,
-    RPL_WHOISUSER,
-    RPL_WHOISSERVER,
-    RPL_WHOISOPERATOR,
-    RPL_WHOISIDLE,
-    RPL_WHOISCHANNELS,
-    RPL_WHOISSPECIAL,
-    RPL_WHOISACCOUNT,
-    RPL_WHOISACTUALLY,
-    RPL_WHOISHOST,
-    RPL_WHOISMODES,
-    RPL_WHOISSECURE,
-    RPL_ENDOFWHOIS,
-}
+_CHANNEL_REGEX = re.compile(backend.CHANNEL_REGEX)
+
+WHOIS_REPLY_CODES = frozenset(
+    {
+        RPL_WHOISCERTFP,
+        RPL_WHOISREGNICK,
+        RPL_WHOISUSER,
+        RPL_WHOISSERVER,
+        RPL_WHOISOPERATOR,
+        RPL_WHOISIDLE,
+        RPL_WHOISCHANNELS,
+        RPL_WHOISSPECIAL,
+        RPL_WHOISACCOUNT,
+        RPL_WHOISACTUALLY,
+        RPL_WHOISHOST,
+        RPL_WHOISMODES,
+        RPL_WHOISSECURE,
+        RPL_ENDOFWHOIS,
+    }
+)
+
+
+def _get_nick_tag(nick: str, my_nick: str) -> str:
+    return "self-nick" if nick == my_nick else "other-nick"
 
 
 def _get_views_relevant_for_nick(
     server_view: views.ServerView, nick: str
 ) -> list[views.ChannelView | views.PMView]:
-    result: list[views.ChannelView | views.PMView] = []
-    for view in server_view.get_subviews():
-        if isinstance(view, views.ChannelView) and nick in view.userlist.get_nicks():
-            result.append(view)
+    result: list[views.ChannelView | views.PMView] = list(
+        server_view.channel_views_by_nick.get(nick, ())
+    )
 
     pm_view = server_view.find_pm(nick)
     if pm_view is not None:
@@ -75,10 +84,10 @@ def _add_privmsg_to_view(
     sender: str,
     text: str,
     *,
-    pinged: bool = False,
+    check_ping: bool = False,
     history_id: int | None = None,
     notification: bool = False,
-) -> None:
+) -> bool:
     # /me asdf --> "\x01ACTION asdf\x01"
     if text.startswith("\x01ACTION ") and text.endswith("\x01"):
         slash_me = True
@@ -86,33 +95,55 @@ def _add_privmsg_to_view(
     else:
         slash_me = False
 
+    my_nick = view.server_view.settings.nick
+
+    # Most messages don't mention anyone, and then looking for nicks is
+    # unnecessary. Nicks are ASCII, so casefold() finds them if lower() would.
+    casefolded_text = text.casefold()
+    mentions_my_nick = my_nick.casefold() in casefolded_text
     if isinstance(view, views.ChannelView):
-        all_nicks = list(view.userlist.get_nicks())
-        if view.server_view.settings.nick not in all_nicks:
-            # Possible, if user is kicked
-            all_nicks.append(view.server_view.settings.nick)
+        might_mention_someone = mentions_my_nick or view.userlist.any_nick_in(
+            casefolded_text
+        )
     else:
-        all_nicks = [view.nick_of_other_user, view.server_view.settings.nick]
+        might_mention_someone = (
+            mentions_my_nick or view.nick_of_other_user.casefold() in casefolded_text
+        )
 
-    parts = []
-    for substring, base_tags in textwidget_tags.parse_text(text):
-        for subsubstring, nick_tag in backend.find_nicks(
-            substring, view.server_view.settings.nick, all_nicks
-        ):
-            tags = base_tags.copy()
-            if nick_tag is not None:
-                tags.append(nick_tag)
-            parts.append(views.MessagePart(subsubstring, tags=tags))
+    if might_mention_someone:
+        all_nicks: tuple[str, ...]
+        if isinstance(view, views.ChannelView):
+            all_nicks = view.userlist.get_nicks()
+            if my_nick not in view.userlist:
+                # Possible, if user is kicked
+                all_nicks += (my_nick,)
+        else:
+            all_nicks = (view.nick_of_other_user, my_nick)
 
-    if sender == view.server_view.settings.nick:
-        sender_tag = "self-nick"
+        parts = [
+            views.MessagePart(substring, tags=tags)
+            for substring, tags in backend.find_nicks_in_parts(
+                textwidget_tags.parse_text(text), my_nick, all_nicks
+            )
+        ]
     else:
-        sender_tag = "other-nick"
+        parts = [
+            views.MessagePart(substring, tags=base_tags)
+            for substring, base_tags in textwidget_tags.parse_text(text)
+        ]
+
+    # Reuse the nick highlighting instead of searching for the nick again
+    pinged = (
+        check_ping
+        and mentions_my_nick
+        and any("self-nick" in part.tags for part in parts)
+    )
+
+    sender_tag = _get_nick_tag(sender, my_nick)
 
     if slash_me:
         view.add_message(
-            [views.MessagePart(sender, tags=[sender_tag]), views.MessagePart(" ")]
-            + parts,
+            [views.MessagePart(sender, tags=(sender_tag,)), views.SPACE_PART] + parts,
             pinged=pinged,
             history_id=history_id,
         )
@@ -126,7 +157,7 @@ def _add_privmsg_to_view(
             history_id=history_id,
         )
 
-    if notification:
+    if notification or pinged:
         if slash_me:
             view.add_notification(f"{sender} {text}")
         else:
@@ -137,6 +168,8 @@ def _add_privmsg_to_view(
             else:
                 view.add_notification(text)
 
+    return pinged
+
 
 # privmsg can be a message to a channel or a PM (actual Private Message directly to the user)
 def _handle_privmsg(
@@ -144,8 +177,9 @@ def _handle_privmsg(
 ) -> None:
     # recipient is server or nick
     recipient, text = args
+    my_nick = server_view.settings.nick
 
-    if recipient == server_view.settings.nick:  # actual PM
+    if recipient == my_nick:  # actual PM
         pm_view = server_view.find_or_open_pm(sender)
         _add_privmsg_to_view(pm_view, sender, text, notification=True)
         pm_view.add_view_selector_tag("new_message")
@@ -154,23 +188,13 @@ def _handle_privmsg(
         channel_view = server_view.find_channel(recipient)
         assert channel_view is not None
 
-        pinged = any(
-            tag == "self-nick"
-            for substring, tag in backend.find_nicks(
-                text, server_view.settings.nick, [server_view.settings.nick]
-            )
-        )
-        _add_privmsg_to_view(
+        pinged = _add_privmsg_to_view(
             channel_view,
             sender,
             text,
-            pinged=pinged,
+            check_ping=True,
             notification=(
-                pinged
-                or (
-                    channel_view.channel_name
-                    in server_view.settings.extra_notifications
-                )
+                channel_view.channel_name in server_view.settings.extra_notifications
             ),
         )
         channel_view.add_view_selector_tag("pinged" if pinged else "new_message")
@@ -188,10 +212,10 @@ def _handle_join(server_view: views.ServerView, nick: str, args: list[str]) -> N
     channel_view.userlist.add_user(nick)
     channel_view.add_message(
         [
-            views.MessagePart(nick, tags=["other-nick"]),
-            views.MessagePart(" joined "),
-            views.MessagePart(channel_view.channel_name, tags=["channel"]),
-            views.MessagePart("."),
+            views.MessagePart(nick, tags=("other-nick",)),
+            views.JOINED_PART,
+            views.MessagePart(channel_view.channel_name, tags=("channel",)),
+            views.DOT_PART,
         ],
         show_in_gui=channel_view.server_view.should_show_join_leave_message(nick),
     )
@@ -221,10 +245,10 @@ def _handle_part(
 
         channel_view.add_message(
             [
-                views.MessagePart(parting_nick, tags=["other-nick"]),
-                views.MessagePart(" left "),
-                views.MessagePart(channel_view.channel_name, tags=["channel"]),
-                views.MessagePart("."),
+                views.MessagePart(parting_nick, tags=("other-nick",)),
+                views.LEFT_PART,
+                views.MessagePart(channel_view.channel_name, tags=("channel",)),
+                views.DOT_PART,
                 views.MessagePart(extra),
             ],
             show_in_gui=channel_view.server_view.should_show_join_leave_message(
@@ -242,14 +266,14 @@ def _handle_nick(server_view: views.ServerView, old_nick: str, args: list[str])
         # nick that is currently being used.
         server_view.settings.nick = new_nick
         server_view.settings.save()
-        server_view.irc_widget.update_nick_button()
+        server_view.irc_widget.update_nick_button(server_view)
 
         for view in server_view.get_subviews(include_server=True):
             view.add_message(
                 [
-                    views.MessagePart("You are now known as "),
-                    views.MessagePart(new_nick, tags=["self-nick"]),
-                    views.MessagePart("."),
+                    views.YOU_ARE_NOW_KNOWN_AS_PART,
+                    views.MessagePart(new_nick, tags=("self-nick",)),
+                    views.DOT_PART,
                 ]
             )
             if isinstance(view, views.ChannelView):
@@ -259,10 +283,10 @@ def _handle_nick(server_view: views.ServerView, old_nick: str, args: list[str])
         for view in _get_views_relevant_for_nick(server_view, old_nick):
             view.add_message(
                 [
-                    views.MessagePart(old_nick, tags=["other-nick"]),
-                    views.MessagePart(" is now known as "),
-                    views.MessagePart(new_nick, tags=["other-nick"]),
-                    views.MessagePart("."),
+                    views.MessagePart(old_nick, tags=("other-nick",)),
+                    views.IS_NOW_KNOWN_AS_PART,
+                    views.MessagePart(new_nick, tags=("other-nick",)),
+                    views.DOT_PART,
                 ]
             )
 
@@ -275,8 +299,7 @@ def _handle_nick(server_view: views.ServerView, old_nick: str, args: list[str])
                 if old_view is not None and old_view != view:
                     server_view.irc_widget.remove_view(old_view)
 
-                view.view_name = new_nick
-                view.reopen_log_file()
+                view.set_nick_of_other_user(new_nick)
 
 
 def _handle_quit(server_view: views.ServerView, nick: str, args: list[str]) -> None:
@@ -285,14 +308,16 @@ def _handle_quit(server_view: views.ServerView, nick: str, args: list[str]) -> N
     else:
         reason_string = ""
 
+    show_in_gui = server_view.should_show_join_leave_message(nick)
+
     # This isn't perfect, other person's QUIT not received if not both joined on the same channel
     for view in _get_views_relevant_for_nick(server_view, nick):
         view.add_message(
             [
-                views.MessagePart(nick, tags=["other-nick"]),
+                views.MessagePart(nick, tags=("other-nick",)),
                 views.MessagePart(" quit." + reason_string),
             ],
-            show_in_gui=view.server_view.should_show_join_leave_message(nick),
+            show_in_gui=show_in_gui,
         )
         if isinstance(view, views.ChannelView):
             view.userlist.remove_user(nick)
@@ -327,22 +352,16 @@ def _handle_mode(
     else:
         message = f"sets mode {mode_flags} on"
 
-    if target_nick == channel_view.server_view.settings.nick:
-        target_tag = "self-nick"
-    else:
-        target_tag = "other-nick"
-
-    if setter_nick == channel_view.server_view.settings.nick:
-        setter_tag = "self-nick"
-    else:
-        setter_tag = "other-nick"
+    my_nick = server_view.settings.nick
+    target_tag = _get_nick_tag(target_nick, my_nick)
+    setter_tag = _get_nick_tag(setter_nick, my_nick)
 
     channel_view.add_message(
         [
-            views.MessagePart(setter_nick, tags=[setter_tag]),
+            views.MessagePart(setter_nick, tags=(setter_tag,)),
             views.MessagePart(f" {message} "),
-            views.MessagePart(target_nick, tags=[target_tag]),
-            views.MessagePart("."),
+            views.MessagePart(target_nick, tags=(target_tag,)),
+            views.DOT_PART,
         ]
     )
 
@@ -354,95 +373,105 @@ def _handle_kick(server_view: views.ServerView, kicker: str, args: list[str]) ->
     assert channel_view is not None
 
     channel_view.userlist.remove_user(kicked_nick)
-    if kicker == channel_view.server_view.settings.nick:
-        kicker_tag = "self-nick"
-    else:
-        kicker_tag = "other-nick"
+    my_nick = server_view.settings.nick
+    kicker_tag = _get_nick_tag(kicker, my_nick)
 
-    if kicked_nick == channel_view.server_view.settings.nick:
+    if kicked_nick == my_nick:
         channel_view.add_message(
             [
-                views.MessagePart(kicker, tags=[kicker_tag]),
+                views.MessagePart(kicker, tags=(kicker_tag,)),
                 views.MessagePart(" has kicked you from "),
                 # TODO: Make channel tag clickable?
-                views.MessagePart(channel_view.channel_name, tags=["channel"]),
+                views.MessagePart(channel_view.channel_name, tags=("channel",)),
                 views.MessagePart(
                     f". (Reason: {reason}) You can still join by typing "
                 ),
                 # TODO: new tag instead of abusing the "pinged" tag for this
                 views.MessagePart(
-                    f"/join {channel_view.channel_name}", tags=["pinged"]
+                    f"/join {channel_view.channel_name}", tags=("pinged",)
                 ),
-                views.MessagePart("."),
+                views.DOT_PART,
             ],
             tag="error",
         )
     else:
         channel_view.add_message(
             [
-                views.MessagePart(kicker, tags=[kicker_tag]),
+                views.MessagePart(kicker, tags=(kicker_tag,)),
                 views.MessagePart(" has kicked "),
-                views.MessagePart(kicked_nick, tags=["other-nick"]),
+                views.MessagePart(kicked_nick, tags=("other-nick",)),
                 views.MessagePart(" from "),
                 # TODO: Make channel tag clickable?
-                views.MessagePart(channel_view.channel_name, tags=["channel"]),
+                views.MessagePart(channel_view.channel_name, tags=("channel",)),
                 views.MessagePart(f". (Reason: {reason})"),
             ]
         )
 
 
 def _handle_cap(server_view: views.ServerView, args: list[str]) -> None:
+    core = server_view.core
     subcommand = args[1]
     if subcommand == "ACK":
         acknowledged = args[-1].split()
-        server_view.core.pending_cap_count -= len(acknowledged)
+        core.pending_cap_count -= len(acknowledged)
 
         if "sasl" in acknowledged:
-            server_view.core.send("AUTHENTICATE PLAIN")
+            core.send("AUTHENTICATE PLAIN")
 
-        for capability in acknowledged:
-            server_view.core.cap_list.add(capability)
+        core.cap_list.update(acknowledged)
 
     elif subcommand == "NAK":
         rejected = args[-1].split()
-        server_view.core.pending_cap_count -= len(rejected)
+        core.pending_cap_count -= len(rejected)
         if "sasl" in rejected:
             # TODO: this good?
             raise ValueError("The server does not support SASL.")
 
     else:
-        server_view.core.send("CAP END")
+        core.send("CAP END")
         raise ValueError("Invalid CAP response. Aborting Capability Negotiation.")
 
     # If we use SASL, we can't send CAP END until all SASL stuff is done.
     # If "sasl" is in cap_list, Mantaray sends CAP END after the server
     # has replied with RPL_SASLSUCCESS or ERR_SASLFAIL
-    if (
-        server_view.core.pending_cap_count == 0
-        and "sasl" not in server_view.core.cap_list
-    ):
-        server_view.core.send("CAP END")
+    if core.pending_cap_count == 0 and "sasl" not in core.cap_list:
+        core.send("CAP END")
 
 
 def _handle_authenticate(server_view: views.ServerView) -> None:
+    core = server_view.core
     query = f"\0{server_view.settings.username}\0{server_view.settings.password}"
-    b64_query = b64encode(query.encode("utf-8")).decode("utf-8")
+    b64_query = b64encode(query.encode("utf-8"))
     for i in range(0, len(b64_query), 400):
-        server_view.core.send("AUTHENTICATE " + b64_query[i : i + 400])
+        # base64 output is always ascii
+        core.send("AUTHENTICATE " + b64_query[i : i + 400].decode("ascii"))
 
+    # A 400-byte chunk means that more is coming, so end with an empty chunk
+    # https://ircv3.net/specs/extensions/sasl-3.1#the-authenticate-command
+    if len(b64_query) % 400 == 0:
+        core.send("AUTHENTICATE +")
 
-class _JoinInProgress:
+
+class JoinInProgress:
     def __init__(self) -> None:
         self.topic: str | None = None
         self.nicks: list[str] = []
 
 
-_joins_in_progress: dict[tuple[views.ServerView, str], _JoinInProgress] = {}
+# Unlike setdefault(), doesn't create a JoinInProgress for each NAMES reply line
+def _get_join_in_progress(
+    server_view: views.ServerView, channel: str
+) -> JoinInProgress:
+    join = server_view.joins_in_progress.get(channel)
+    if join is None:
+        join = JoinInProgress()
+        server_view.joins_in_progress[channel] = join
+    return join
 
 
 def _handle_numeric_rpl_topic(server_view: views.ServerView, args: list[str]) -> None:
     channel, topic = args[1:]
-    join = _joins_in_progress.setdefault((server_view, channel), _JoinInProgress())
+    join = _get_join_in_progress(server_view, channel)
     join.topic = topic
 
 
@@ -479,6 +508,11 @@ def _handle_other_user_away_reply(
             view.userlist.set_away(nick, is_away=True, reason=reason)
 
 
+# Nicks can't contain these characters, so they can be deleted from the whole
+# list of names at once, instead of stripping them from each name separately.
+_DELETE_PREFIXES = str.maketrans("", "", "~&@%+")
+
+
 def _handle_namreply(server_view: views.ServerView, args: list[str]) -> None:
     # TODO: wtf are the first 2 args?
     # rfc1459 doesn't mention them, but freenode
@@ -488,22 +522,14 @@ def _handle_namreply(server_view: views.ServerView, args: list[str]) -> None:
     # TODO: the prefixes have meanings
     # TODO: get the prefixes actually used from RPL_ISUPPORT
     # https://modern.ircdocs.horse/#channel-membership-prefixes
-    join = _joins_in_progress.setdefault((server_view, channel), _JoinInProgress())
-    join.nicks.extend(name.lstrip("~&@%+") for name in names.split())
-
-
-# While waiting for a response to a WHO, don't send another WHO.
-# This prevents the server from deciding to disconnect because it's
-# being asked to send a lot of data quickly.
-#
-# TODO: clear this when reconnecting
-_pending_who_sends: dict[views.ServerView, list[str]] = {}
+    join = _get_join_in_progress(server_view, channel)
+    join.nicks += names.translate(_DELETE_PREFIXES).split()
 
 
 def _handle_endofnames(server_view: views.ServerView, args: list[str]) -> None:
     # joining a channel finished
     channel, human_readable_message = args[-2:]
-    join = _joins_in_progress.pop((server_view, channel))
+    join = server_view.joins_in_progress.pop(channel)
 
     channel_view = server_view.find_channel(channel)
     if channel_view is None:
@@ -514,20 +540,20 @@ def _handle_endofnames(server_view: views.ServerView, args: list[str]) -> None:
         channel_view.userlist.set_nicks(join.nicks)
 
     if "away-notify" in server_view.core.cap_list:
-        if server_view in _pending_who_sends:
+        if server_view.pending_who_sends is not None:
             # WHO sending is currently in progress, queue the next one
-            _pending_who_sends[server_view].append(channel)
+            server_view.pending_who_sends.append(channel)
         else:
-            _pending_who_sends[server_view] = []
+            server_view.pending_who_sends = collections.deque()
             server_view.core.send(f"WHO {channel}")
 
     topic = join.topic or "(no topic)"
     channel_view.add_message(
         [
             views.MessagePart("The topic of "),
-            views.MessagePart(channel_view.channel_name, tags=["channel"]),
+            views.MessagePart(channel_view.channel_name, tags=("channel",)),
             views.MessagePart(" is: "),
-            views.MessagePart(topic, tags=["topic"]),
+            views.MessagePart(topic, tags=("topic",)),
         ]
     )
 
@@ -540,20 +566,20 @@ def _handle_endofnames(server_view: views.ServerView, args: list[str]) -> None:
 
 
 def _handle_endofmotd(server_view: views.ServerView) -> None:
-    server_view.core.send(f"WHOIS {server_view.settings.nick}")
+    core = server_view.core
+    core.send(f"WHOIS {server_view.settings.nick}")
 
     channel_views = [
         v for v in server_view.get_subviews() if isinstance(v, views.ChannelView)
     ]
     if channel_views:
         # Reconnect after connectivity error, join whatever channels are open
-        for view in server_view.get_subviews():
-            if isinstance(view, views.ChannelView):
-                server_view.core.send(f"JOIN {view.channel_name}")
+        for view in channel_views:
+            core.send(f"JOIN {view.channel_name}")
     else:
         # Mantaray just started, connect according to settings
         for channel in server_view.settings.joined_channels:
-            server_view.core.send(f"JOIN {channel}")
+            core.send(f"JOIN {channel}")
 
 
 def _handle_whoreply(server_view: views.ServerView, args: list[str]) -> None:
@@ -572,11 +598,13 @@ def _handle_whoreply(server_view: views.ServerView, args: list[str]) -> None:
 
 
 def _handle_endofwho(server_view: views.ServerView) -> None:
-    if _pending_who_sends[server_view]:
-        channel = _pending_who_sends[server_view].pop()
+    assert server_view.pending_who_sends is not None
+    if server_view.pending_who_sends:
+        # Send the WHOs in the same order as the channels were joined
+        channel = server_view.pending_who_sends.popleft()
         server_view.core.send(f"WHO {channel}")
     else:
-        del _pending_who_sends[server_view]
+        server_view.pending_who_sends = None
 
 
 def _handle_literally_topic(
@@ -586,18 +614,15 @@ def _handle_literally_topic(
     channel_view = server_view.find_channel(channel)
     assert channel_view is not None
 
-    if who_changed == channel_view.server_view.settings.nick:
-        nick_tag = "self-nick"
-    else:
-        nick_tag = "other-nick"
+    nick_tag = _get_nick_tag(who_changed, server_view.settings.nick)
 
     channel_view.add_message(
         [
-            views.MessagePart(who_changed, tags=[nick_tag]),
+            views.MessagePart(who_changed, tags=(nick_tag,)),
             views.MessagePart(" changed the topic of "),
-            views.MessagePart(channel_view.channel_name, tags=["channel"]),
+            views.MessagePart(channel_view.channel_name, tags=("channel",)),
             views.MessagePart(": "),
-            views.MessagePart(topic, tags=["topic"]),
+            views.MessagePart(topic, tags=("topic",)),
         ]
     )
 
@@ -609,7 +634,7 @@ def _handle_unknown_message(
     sender = (
         msg.server if isinstance(msg, backend.MessageFromServer) else msg.sender_nick
     )
-    text = " ".join([msg.command] + msg.args)
+    text = " ".join((msg.command, *msg.args))
 
     # Errors seem to always be 4xx, 5xx or 7xx.
     # Not all 6xx responses are errors, e.g. RPL_STARTTLS = 670
@@ -622,163 +647,202 @@ def _handle_unknown_message(
         server_view.add_message(text, sender)
 
 
-def _handle_received_message(
-    server_view: views.ServerView,
-    msg: backend.MessageFromServer | backend.MessageFromUser,
+def _handle_mode_message(
+    server_view: views.ServerView, msg: backend.MessageFromUser
 ) -> None:
-    if msg.command == "PRIVMSG":
-        assert isinstance(msg, backend.MessageFromUser)
-        _handle_privmsg(server_view, msg.sender_nick, msg.args)
-
-    elif msg.command == "JOIN":
-        assert isinstance(msg, backend.MessageFromUser)
-        _handle_join(server_view, msg.sender_nick, msg.args)
-
-    elif msg.command == "PART":
-        assert isinstance(msg, backend.MessageFromUser)
-        _handle_part(server_view, msg.sender_nick, msg.args)
-
-    elif msg.command == "NICK":
-        assert isinstance(msg, backend.MessageFromUser)
-        _handle_nick(server_view, msg.sender_nick, msg.args)
-
-    elif msg.command == "QUIT":
-        assert isinstance(msg, backend.MessageFromUser)
-        _handle_quit(server_view, msg.sender_nick, msg.args)
-
-    elif msg.command == "PING":
-        _handle_ping(server_view, msg.args)
-
     # TODO: figure out what MODE with 2 or 4 args is
-    elif msg.command == "MODE" and len(msg.args) == 3:
-        assert isinstance(msg, backend.MessageFromUser)
+    if len(msg.args) == 3:
         _handle_mode(server_view, msg.sender_nick, msg.args)
+    else:
+        _handle_unknown_message(server_view, msg)
 
-    elif msg.command == "KICK":
-        assert isinstance(msg, backend.MessageFromUser)
-        _handle_kick(server_view, msg.sender_nick, msg.args)
-
-    elif msg.command == "AWAY":
-        assert isinstance(msg, backend.MessageFromUser)
-        _handle_away(server_view, msg.sender_nick, msg.args)
-
-    elif msg.command == "CAP":
-        _handle_cap(server_view, msg.args)
-
-    elif msg.command == "AUTHENTICATE":
-        _handle_authenticate(server_view)
 
-    elif msg.command == RPL_WELCOME and msg.args[0] != server_view.settings.nick:
+def _handle_welcome(
+    server_view: views.ServerView, msg: backend.MessageFromServer
+) -> None:
+    my_nick = server_view.settings.nick
+    if msg.args[0] != my_nick:
         # Use whatever nickname the server tells us to use.
         # Needed e.g. when nick is in use and you changed nick during connecting.
-        _handle_nick(server_view, server_view.settings.nick, msg.args)
+        _handle_nick(server_view, my_nick, msg.args)
+    else:
+        _handle_unknown_message(server_view, msg)
 
-    elif msg.command == RPL_SASLSUCCESS or msg.command == ERR_SASLFAIL:
-        assert isinstance(msg, backend.MessageFromServer)
-        server_view.add_message(f'{msg.command} {" ".join(msg.args)}', msg.server)
-        server_view.core.send("CAP END")
 
-    elif msg.command == RPL_NAMREPLY:
-        _handle_namreply(server_view, msg.args)
+def _handle_sasl_result(
+    server_view: views.ServerView, msg: backend.MessageFromServer
+) -> None:
+    server_view.add_message(f'{msg.command} {" ".join(msg.args)}', msg.server)
+    server_view.core.send("CAP END")
+
+
+def _handle_unaway(server_view: views.ServerView, args: list[str]) -> None:
+    back_notification = args[1]
+    my_nick = server_view.settings.nick
+    for user_view in server_view.get_subviews(include_server=True):
+        user_view.add_message(back_notification)
+        if isinstance(user_view, views.ChannelView):
+            user_view.userlist.set_away(my_nick, False)
+
+    server_view.core.is_away = False
+    server_view.irc_widget.update_nick_button(server_view)
+
+
+def _handle_nowaway(server_view: views.ServerView, args: list[str]) -> None:
+    away_notification = args[1]
+    my_nick = server_view.settings.nick
+    for user_view in server_view.get_subviews(include_server=True):
+        user_view.add_message(away_notification)
+        if isinstance(user_view, views.ChannelView):
+            user_view.userlist.set_away(
+                my_nick, is_away=True, reason=server_view.last_away_status
+            )
 
-    elif msg.command == RPL_ENDOFNAMES:
-        _handle_endofnames(server_view, msg.args)
+    server_view.core.is_away = True
+    server_view.irc_widget.update_nick_button(server_view)
+
+
+# Looking up the handler from a dict is faster than comparing the command to
+# each supported command. There are separate dicts for messages from users and
+# messages from the server, so that the handlers know what they get. Commands
+# not in the dict are handled by _handle_unknown_message().
+_USER_MESSAGE_HANDLERS: dict[
+    str, Callable[[views.ServerView, backend.MessageFromUser], None]
+] = {
+    "PRIVMSG": (
+        lambda server_view, msg: _handle_privmsg(server_view, msg.sender_nick, msg.args)
+    ),
+    "JOIN": (
+        lambda server_view, msg: _handle_join(server_view, msg.sender_nick, msg.args)
+    ),
+    "PART": (
+        lambda server_view, msg: _handle_part(server_view, msg.sender_nick, msg.args)
+    ),
+    "NICK": (
+        lambda server_view, msg: _handle_nick(server_view, msg.sender_nick, msg.args)
+    ),
+    "QUIT": (
+        lambda server_view, msg: _handle_quit(server_view, msg.sender_nick, msg.args)
+    ),
+    "MODE": _handle_mode_message,
+    "KICK": (
+        lambda server_view, msg: _handle_kick(server_view, msg.sender_nick, msg.args)
+    ),
+    "AWAY": (
+        lambda server_view, msg: _handle_away(server_view, msg.sender_nick, msg.args)
+    ),
+    "TOPIC": (
+        lambda server_view, msg: _handle_literally_topic(
+            server_view, msg.sender_nick, msg.args
+        )
+    ),
+}
 
-    elif msg.command == RPL_ENDOFMOTD:
-        _handle_endofmotd(server_view)
+_SERVER_MESSAGE_HANDLERS: dict[
+    str, Callable[[views.ServerView, backend.MessageFromServer], None]
+] = {
+    "PING": (lambda server_view, msg: _handle_ping(server_view, msg.args)),
+    "CAP": (lambda server_view, msg: _handle_cap(server_view, msg.args)),
+    "AUTHENTICATE": (lambda server_view, msg: _handle_authenticate(server_view)),
+    RPL_WELCOME: _handle_welcome,
+    RPL_SASLSUCCESS: _handle_sasl_result,
+    ERR_SASLFAIL: _handle_sasl_result,
+    RPL_NAMREPLY: (lambda server_view, msg: _handle_namreply(server_view, msg.args)),
+    RPL_ENDOFNAMES: (
+        lambda server_view, msg: _handle_endofnames(server_view, msg.args)
+    ),
+    RPL_ENDOFMOTD: (lambda server_view, msg: _handle_endofmotd(server_view)),
+    RPL_TOPIC: (
+        lambda server_view, msg: _handle_numeric_rpl_topic(server_view, msg.args)
+    ),
+    **dict.fromkeys(WHOIS_REPLY_CODES, _handle_whois_reply),
+    RPL_AWAY: (
+        lambda server_view, msg: _handle_other_user_away_reply(server_view, msg.args)
+    ),
+    RPL_WHOREPLY: (lambda server_view, msg: _handle_whoreply(server_view, msg.args)),
+    RPL_ENDOFWHO: (lambda server_view, msg: _handle_endofwho(server_view)),
+    RPL_UNAWAY: (lambda server_view, msg: _handle_unaway(server_view, msg.args)),
+    RPL_NOWAWAY: (lambda server_view, msg: _handle_nowaway(server_view, msg.args)),
+}
 
-    elif msg.command == RPL_TOPIC:
-        _handle_numeric_rpl_topic(server_view, msg.args)
 
-    elif msg.command in WHOIS_REPLY_CODES:
-        assert isinstance(msg, backend.MessageFromServer)
-        _handle_whois_reply(server_view, msg)
+def _handle_message_from_user(
+    server_view: views.ServerView, msg: backend.MessageFromUser
+) -> None:
+    handler = _USER_MESSAGE_HANDLERS.get(msg.command, _handle_unknown_message)
+    handler(server_view, msg)
 
-    elif msg.command == RPL_AWAY:
-        _handle_other_user_away_reply(server_view, msg.args)
 
-    elif msg.command == RPL_WHOREPLY:
-        _handle_whoreply(server_view, msg.args)
+def _handle_message_from_server(
+    server_view: views.ServerView, msg: backend.MessageFromServer
+) -> None:
+    handler = _SERVER_MESSAGE_HANDLERS.get(msg.command, _handle_unknown_message)
+    handler(server_view, msg)
 
-    elif msg.command == RPL_ENDOFWHO:
-        _handle_endofwho(server_view)
 
-    elif msg.command == RPL_UNAWAY:
-        back_notification = msg.args[1]
-        for user_view in server_view.get_subviews(include_server=True):
-            user_view.add_message(back_notification)
-            if isinstance(user_view, views.ChannelView):
-                user_view.userlist.set_away(server_view.settings.nick, False)
+def _handle_connectivity_message(
+    server_view: views.ServerView, event: backend.ConnectivityMessage
+) -> None:
+    for view in server_view.get_subviews(include_server=True):
+        view.add_message(event.message, tag=("error" if event.is_error else "info"))
 
-        server_view.core.is_away = False
-        server_view.irc_widget.update_nick_button()
+    # These messages come when not connected, so joins and WHOs in progress
+    # will never finish. Don't let them affect the next connection.
+    server_view.joins_in_progress.clear()
+    server_view.pending_who_sends = None
+
+    # When reconnecting, the user is marked as not being away.
+    # This can affect the nick button because it shows whether the user is away.
+    server_view.irc_widget.update_nick_button(server_view)
 
-    elif msg.command == RPL_NOWAWAY:
-        away_notification = msg.args[1]
-        for user_view in server_view.get_subviews(include_server=True):
-            user_view.add_message(away_notification)
-            if isinstance(user_view, views.ChannelView):
-                user_view.userlist.set_away(
-                    server_view.settings.nick,
-                    is_away=True,
-                    reason=server_view.last_away_status,
-                )
 
-        server_view.core.is_away = True
-        server_view.irc_widget.update_nick_button()
+def _handle_host_changed(
+    server_view: views.ServerView, event: backend.HostChanged
+) -> None:
+    server_view.view_name = event.new
+    for subview in server_view.get_subviews(include_server=True):
+        subview.reopen_log_file()
 
-    elif msg.command == "TOPIC" and isinstance(msg, backend.MessageFromUser):
-        _handle_literally_topic(server_view, msg.sender_nick, msg.args)
 
+def _handle_sent_privmsg(
+    server_view: views.ServerView, event: backend.SentPrivmsg
+) -> None:
+    channel_view = server_view.find_channel(event.nick_or_channel)
+    if channel_view is None:
+        assert not _CHANNEL_REGEX.fullmatch(
+            event.nick_or_channel
+        ), event.nick_or_channel
+        pm_view = server_view.find_or_open_pm(event.nick_or_channel)
+
+        # /msg NickServ identify <password>   --> hide password
+        text = event.text
+        if pm_view.nick_of_other_user.lower() == "nickserv" and text.lower().startswith(
+            "identify "
+        ):
+            text = text[:9] + "********"
+
+        _add_privmsg_to_view(
+            pm_view, server_view.settings.nick, text, history_id=event.history_id
+        )
     else:
-        _handle_unknown_message(server_view, msg)
+        _add_privmsg_to_view(
+            channel_view,
+            server_view.settings.nick,
+            event.text,
+            history_id=event.history_id,
+        )
 
 
-def handle_event(event: backend.IrcEvent, server_view: views.ServerView) -> None:
-    if isinstance(event, (backend.MessageFromServer, backend.MessageFromUser)):
-        _handle_received_message(server_view, event)
+# Looking up the handler from a dict is faster than a chain of isinstance() checks.
+# Every type in backend.IrcEvent must be here (checked in tests/test_messaging.py).
+_EVENT_HANDLERS: dict[type, Callable[[views.ServerView, Any], None]] = {
+    backend.MessageFromServer: _handle_message_from_server,
+    backend.MessageFromUser: _handle_message_from_user,
+    backend.ConnectivityMessage: _handle_connectivity_message,
+    backend.HostChanged: _handle_host_changed,
+    backend.SentPrivmsg: _handle_sent_privmsg,
+}
 
-    elif isinstance(event, backend.ConnectivityMessage):
-        for view in server_view.get_subviews(include_server=True):
-            view.add_message(event.message, tag=("error" if event.is_error else "info"))
-
-        # When reconnecting, the user is marked as not being away.
-        # This can affect the nick button because it shows whether the user is away.
-        server_view.irc_widget.update_nick_button()
-
-    elif isinstance(event, backend.HostChanged):
-        server_view.view_name = event.new
-        for subview in server_view.get_subviews(include_server=True):
-            subview.reopen_log_file()
-
-    elif isinstance(event, backend.SentPrivmsg):
-        channel_view = server_view.find_channel(event.nick_or_channel)
-        if channel_view is None:
-            assert not re.fullmatch(
-                backend.CHANNEL_REGEX, event.nick_or_channel
-            ), event.nick_or_channel
-            pm_view = server_view.find_or_open_pm(event.nick_or_channel)
-
-            # /msg NickServ identify <password>   --> hide password
-            text = event.text
-            if (
-                pm_view.nick_of_other_user.lower() == "nickserv"
-                and text.lower().startswith("identify ")
-            ):
-                text = text[:9] + "********"
-
-            _add_privmsg_to_view(
-                pm_view, server_view.settings.nick, text, history_id=event.history_id
-            )
-        else:
-            _add_privmsg_to_view(
-                channel_view,
-                server_view.settings.nick,
-                event.text,
-                history_id=event.history_id,
-            )
 
-    else:
-        # If mypy says 'error: unused "type: ignore" comment', you
-        # forgot to check for some class
-        print("can't happen")  # type: ignore
+def handle_event(event: backend.IrcEvent, server_view: views.ServerView) -> None:
+    _EVENT_HANDLERS[type(event)](server_view, event)
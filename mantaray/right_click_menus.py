@@ -18,8 +18,10 @@ else:
     RIGHT_CLICK_BINDINGS = ["<Button-3>"]
 
 
-# The same menu widget is reused, so that we don't need to
-# worry about destroying it when we're done.
+# Each view owns its own context menu (see View.contextmenu), and so does the
+# empty part of the view selector. Only the nick menus share this global menu
+# widget, which is cleared and refilled on each right-click, so that we don't
+# need to worry about destroying it when we're done.
 _global_menu: tkinter.Menu | None = None
 
 
@@ -43,59 +45,68 @@ def _show_menu(menu: tkinter.Menu, event: _AnyEvent) -> None:
     menu.tk_popup(event.x_root + 5, event.y_root)
 
 
-def server_right_click(
-    event: _AnyEvent, irc_widget: IrcWidget, view: ServerView | None
-) -> None:
-    menu = get_menu(clear=True)
+def create_server_view_menu(view: ServerView) -> tkinter.Menu:
+    menu = tkinter.Menu(view.irc_widget, tearoff=False)
+    menu.add_command(label="Server settings...", command=view.show_config_dialog)
+    menu.add_command(
+        label="Leave this server", command=partial(view.irc_widget.leave_server, view)
+    )
+    menu.add_command(
+        label="Connect to a new server...", command=view.irc_widget.add_server
+    )
+    return menu
 
-    if view is not None:
-        assert view.irc_widget == irc_widget
-        menu.add_command(label="Server settings...", command=view.show_config_dialog)
-        menu.add_command(
-            label="Leave this server",
-            command=partial(irc_widget.leave_server, view),
-            # To leave the last server, you need to close window instead
-            state=("disabled" if len(irc_widget.get_server_views()) == 1 else "normal"),
-        )
 
+def create_empty_view_selector_menu(irc_widget: IrcWidget) -> tkinter.Menu:
+    menu = tkinter.Menu(irc_widget, tearoff=False)
     menu.add_command(label="Connect to a new server...", command=irc_widget.add_server)
-    _show_menu(menu, event)
+    return menu
 
 
-def channel_view_right_click(event: _AnyEvent, view: ChannelView) -> None:
-    def toggle_autojoin(*junk: object) -> None:
-        if view.channel_name in view.server_view.settings.joined_channels:
-            view.server_view.settings.joined_channels.remove(view.channel_name)
-        else:
-            view.server_view.settings.joined_channels.append(view.channel_name)
-            view.irc_widget.sort_settings_according_to_gui()
-        view.server_view.settings.save()
-
-    def toggle_extra_notifications(*junk: object) -> None:
-        view.server_view.settings.extra_notifications ^= {view.channel_name}
-        view.server_view.settings.save()
-
-    autojoin_var = tkinter.BooleanVar(
-        value=(view.channel_name in view.server_view.settings.joined_channels)
-    )
-    extra_notif_var = tkinter.BooleanVar(
-        value=(view.channel_name in view.server_view.settings.extra_notifications)
+def empty_view_selector_right_click(event: _AnyEvent, irc_widget: IrcWidget) -> None:
+    _show_menu(irc_widget.empty_view_selector_menu, event)
+
+
+def server_view_right_click(event: _AnyEvent, view: ServerView) -> None:
+    view.contextmenu.entryconfig(
+        "Leave this server",
+        # To leave the last server, you need to close window instead
+        state=(
+            "disabled" if len(view.irc_widget.get_server_views()) == 1 else "normal"
+        ),
     )
+    _show_menu(view.contextmenu, event)
 
-    autojoin_var.trace_add("write", toggle_autojoin)
-    extra_notif_var.trace_add("write", toggle_extra_notifications)
 
-    menu = get_menu(clear=True)
-    menu._garbage_collection_is_lol = (autojoin_var, extra_notif_var)  # type: ignore
-    menu.add_checkbutton(label="Join when Mantaray starts", variable=autojoin_var)
+def create_channel_view_menu(view: ChannelView) -> tkinter.Menu:
+    autojoin_var = tkinter.BooleanVar()
+    extra_notif_var = tkinter.BooleanVar()
+
+    # The settings can change without using the menu, e.g. /part
+    def update_checkbuttons() -> None:
+        settings = view.server_view.settings
+        autojoin_var.set(view.channel_name in settings.joined_channels)
+        extra_notif_var.set(view.channel_name in settings.extra_notifications)
+
+    # Tk runs postcommand whenever the menu is shown. It also keeps the
+    # variables alive for as long as the menu exists.
+    menu = tkinter.Menu(view.irc_widget, tearoff=False, postcommand=update_checkbuttons)
     menu.add_checkbutton(
-        label="Show notifications for all messages", variable=extra_notif_var
+        label="Join when Mantaray starts",
+        variable=autojoin_var,
+        command=view.toggle_autojoin,
     )
-    menu.add_command(
-        label="Part this channel",
-        command=(lambda: view.server_view.core.send(f"PART {view.channel_name}")),
+    menu.add_checkbutton(
+        label="Show notifications for all messages",
+        variable=extra_notif_var,
+        command=view.toggle_extra_notifications,
     )
-    _show_menu(menu, event)
+    menu.add_command(label="Part this channel", command=view.part)
+    return menu
+
+
+def channel_view_right_click(event: _AnyEvent, view: ChannelView) -> None:
+    _show_menu(view.contextmenu, event)
 
 
 def _add_whois(menu: tkinter.Menu, server_view: ServerView, nick: str) -> None:
@@ -107,11 +118,24 @@ def _add_whois(menu: tkinter.Menu, server_view: ServerView, nick: str) -> None:
     )
 
 
+def create_pm_view_menu(view: PMView) -> tkinter.Menu:
+    menu = tkinter.Menu(view.irc_widget, tearoff=False)
+    # Label and state of the /whois item are set when the menu is shown
+    menu.add_command(command=view.whois)
+    menu.add_command(label="Close", command=partial(view.irc_widget.remove_view, view))
+    return menu
+
+
 def pm_view_right_click(event: _AnyEvent, view: PMView) -> None:
-    menu = get_menu(clear=True)
-    _add_whois(menu, view.server_view, view.nick_of_other_user)
-    menu.add_command(label="Close", command=(lambda: view.irc_widget.remove_view(view)))
-    _show_menu(menu, event)
+    # The other user can change their nick while the PM view is open
+    nick = view.nick_of_other_user
+    view.contextmenu.entryconfig(
+        0,
+        label=f"Show user info (/whois {nick})",
+        # Discourage running /whois on the current user
+        state=("disabled" if nick == view.server_view.settings.nick else "normal"),
+    )
+    _show_menu(view.contextmenu, event)
 
 
 def nick_right_click(event: _AnyEvent, server_view: ServerView, nick: str) -> None:
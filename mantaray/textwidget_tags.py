@@ -45,12 +45,15 @@ _MIRC_COLORS = {
 }
 
 
-def parse_text(text: str) -> Iterator[tuple[str, list[str]]]:
-    style_regex = r"\x02|\x1f|\x03[0-9]{1,2}(?:,[0-9]{1,2})?|\x0f"
+# Compiled once, because parse_text() runs for every received message
+_STYLE_REGEX = re.compile(r"(\x02|\x1f|\x03[0-9]{1,2}(?:,[0-9]{1,2})?|\x0f)")
+_COLOR_REGEX = re.compile(r"\x03([0-9]{1,2})(,[0-9]{1,2})?")
+
 
+def parse_text(text: str) -> Iterator[tuple[str, list[str]]]:
     # parts contains matched parts of the regex followed by texts
     # between those matched parts
-    parts = [""] + re.split("(" + style_regex + ")", text)
+    parts = [""] + _STYLE_REGEX.split(text)
     assert len(parts) % 2 == 0
 
     fg = None
@@ -69,7 +72,7 @@ def parse_text(text: str) -> Iterator[tuple[str, list[str]]]:
             underline = True
         elif style_spec.startswith("\x03"):
             # color
-            match = re.fullmatch(r"\x03([0-9]{1,2})(,[0-9]{1,2})?", style_spec)
+            match = _COLOR_REGEX.fullmatch(style_spec)
             assert match is not None
             fg_spec, bg_spec = match.groups()
 
@@ -200,9 +203,9 @@ def config_tags(
             textwidget.tag_bind(
                 tag, right_click, partial(_on_link_clicked, tag, right_click_callback)
             )
+        # Tcl scripts instead of Python functions, so that moving the mouse
+        # doesn't need to call into Python
+        textwidget.tag_bind(tag, "<Enter>", f"{textwidget} configure -cursor hand2")
         textwidget.tag_bind(
-            tag, "<Enter>", (lambda e: textwidget.config(cursor="hand2"))
-        )
-        textwidget.tag_bind(
-            tag, "<Leave>", (lambda e: textwidget.config(cursor=default_cursor))
+            tag, "<Leave>", f"{textwidget} configure -cursor {{{default_cursor}}}"
         )
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import bisect
+import collections
 import logging
 import subprocess
 import sys
@@ -8,11 +10,17 @@ import tkinter
 import webbrowser
 from tkinter import ttk
 from tkinter.font import Font
-from typing import IO, TYPE_CHECKING, Any
+from typing import IO, TYPE_CHECKING, Any, Sequence
 
 from mantaray import backend, config, received, textwidget_tags
 from mantaray.history import History
-from mantaray.right_click_menus import RIGHT_CLICK_BINDINGS, nick_right_click
+from mantaray.right_click_menus import (
+    RIGHT_CLICK_BINDINGS,
+    create_channel_view_menu,
+    create_pm_view_menu,
+    create_server_view_menu,
+    nick_right_click,
+)
 
 if TYPE_CHECKING:
     from typing_extensions import Literal
@@ -25,13 +33,20 @@ AWAY_COLOR = "#95968c"
 
 
 class _UserList:
-    def __init__(self, server_view: ServerView) -> None:
-        self._server_view = server_view
+    def __init__(self, channel_view: ChannelView) -> None:
+        self._channel_view = channel_view
+        self._server_view = channel_view.server_view
         self.treeview = ttk.Treeview(
-            server_view.irc_widget, show="tree", selectmode="extended"
+            self._server_view.irc_widget.userlist_frame,
+            show="tree",
+            selectmode="extended",
         )
         self.treeview.tag_configure("away", foreground=AWAY_COLOR)
 
+        # Same nicks as in the treeview, as sorted (nick.casefold(), nick) tuples.
+        # Makes autocompleting fast, even when there are lots of users.
+        self._casefolded_nicks: list[tuple[str, str]] = []
+
         for right_click in RIGHT_CLICK_BINDINGS:
             self.treeview.bind(right_click, self._on_right_click)
 
@@ -56,15 +71,38 @@ class _UserList:
             self.treeview.selection_set(nick)
             nick_right_click(event, self._server_view, nick)
 
-    def add_user(self, nick: str) -> None:
-        nicks = list(self.get_nicks())
-        assert nick not in nicks
-        nicks.append(nick)
-        nicks.sort(key=str.casefold)
-        self.treeview.insert("", nicks.index(nick), nick, text=nick)
+    def add_user(
+        self,
+        nick: str,
+        *,
+        text: str | None = None,
+        tags: str | list[str] | tuple[str, ...] = (),
+    ) -> None:
+        assert not self.treeview.exists(nick)
+        # The treeview is sorted in the same order as _casefolded_nicks
+        index = bisect.bisect_left(self._casefolded_nicks, (nick.casefold(), nick))
+        self._casefolded_nicks.insert(index, (nick.casefold(), nick))
+        self.treeview.insert(
+            "", index, nick, text=(nick if text is None else text), tags=tags
+        )
+        self._register_nick(nick)
 
     def remove_user(self, nick: str) -> None:
         self.treeview.delete(nick)
+        index = bisect.bisect_left(self._casefolded_nicks, (nick.casefold(), nick))
+        assert self._casefolded_nicks[index] == (nick.casefold(), nick)
+        del self._casefolded_nicks[index]
+        self._unregister_nick(nick)
+
+    def _register_nick(self, nick: str) -> None:
+        by_nick = self._server_view.channel_views_by_nick
+        by_nick.setdefault(nick, set()).add(self._channel_view)
+
+    def _unregister_nick(self, nick: str) -> None:
+        by_nick = self._server_view.channel_views_by_nick
+        by_nick[nick].remove(self._channel_view)
+        if not by_nick[nick]:
+            del by_nick[nick]
 
     def change_nick(self, old_nick: str, new_nick: str) -> None:
         # "OldNick (away: foo bar)" --> "NewNick (away: foo bar)"
@@ -74,17 +112,61 @@ class _UserList:
         tags = self.treeview.item(old_nick, "tags")
 
         self.remove_user(old_nick)
-        self.add_user(new_nick)
-        self.treeview.item(new_nick, text=new_text, tags=tags)
+        self.add_user(new_nick, text=new_text, tags=tags)
 
+    # Same order as in the treeview, but doesn't need to ask Tcl for the nicks
     def get_nicks(self) -> tuple[str, ...]:
-        return self.treeview.get_children("")
+        return tuple(nick for casefolded_nick, nick in self._casefolded_nicks)
+
+    # Returns True if the casefolded text contains any nick, even as a part of
+    # a longer word. Fast, because the casefolded nicks are already known.
+    def any_nick_in(self, casefolded_text: str) -> bool:
+        return any(
+            casefolded_nick in casefolded_text
+            for casefolded_nick, nick in self._casefolded_nicks
+        )
+
+    # Faster than checking whether the nick is in get_nicks()
+    def __contains__(self, nick: str) -> bool:
+        channel_views = self._server_view.channel_views_by_nick.get(nick, ())
+        return self._channel_view in channel_views
 
     # Does not preserve away statuses
     def set_nicks(self, nicks: list[str]) -> None:
+        for casefolded_nick, nick in self._casefolded_nicks:
+            self._unregister_nick(nick)
         self.treeview.delete(*self.treeview.get_children(""))
-        for nick in sorted(nicks, key=str.casefold):
+        self._casefolded_nicks = sorted((nick.casefold(), nick) for nick in nicks)
+        for casefolded_nick, nick in self._casefolded_nicks:
             self.treeview.insert("", "end", nick, text=nick)
+            self._register_nick(nick)
+
+    def destroy(self) -> None:
+        for casefolded_nick, nick in self._casefolded_nicks:
+            self._unregister_nick(nick)
+        self.treeview.destroy()
+
+    # Returns the nick after the given nick, or the first nick if the given nick
+    # is last. Returns None if the given nick is not in the user list.
+    def find_next_nick(self, nick: str) -> str | None:
+        index = bisect.bisect_left(self._casefolded_nicks, (nick.casefold(), nick))
+        if (
+            index == len(self._casefolded_nicks)
+            or self._casefolded_nicks[index][1] != nick
+        ):
+            return None
+        index = (index + 1) % len(self._casefolded_nicks)
+        return self._casefolded_nicks[index][1]
+
+    # Returns the alphabetically first nick that starts with prefix, ignoring case
+    def find_nick_by_prefix(self, prefix: str) -> str | None:
+        prefix = prefix.casefold()
+        index = bisect.bisect_left(self._casefolded_nicks, (prefix,))
+        if index < len(self._casefolded_nicks):
+            casefolded_nick, nick = self._casefolded_nicks[index]
+            if casefolded_nick.startswith(prefix):
+                return nick
+        return None
 
     def set_away(self, nick: str, is_away: bool, reason: str | None = None) -> None:
         if is_away:
@@ -189,24 +271,46 @@ def _show_popup(title: str, text: str) -> None:
 
 
 class MessagePart:
-    def __init__(self, text: str, *, tags: list[str] = []):
+    def __init__(self, text: str, *, tags: Sequence[str] = ()):
         self.text = text
-        self.tags = tags.copy()
+        # tuple() doesn't copy tuples, so constant tags like ("other-nick",)
+        # don't allocate anything
+        self.tags = tuple(tags)
+
 
+# Message parts are never modified after creation, so received.py shares these
+# between messages. They are defined here, not in received.py, because views.py
+# imports received.py before MessagePart exists.
+DOT_PART = MessagePart(".")
+SPACE_PART = MessagePart(" ")
+JOINED_PART = MessagePart(" joined ")
+LEFT_PART = MessagePart(" left ")
+IS_NOW_KNOWN_AS_PART = MessagePart(" is now known as ")
+YOU_ARE_NOW_KNOWN_AS_PART = MessagePart("You are now known as ")
 
 BIBERAO_MODE_DELAY = 60  # seconds
 
 
 class View:
-    def __init__(self, irc_widget: IrcWidget, name: str, *, parent_view_id: str = ""):
+    def __init__(
+        self, irc_widget: IrcWidget, name: str, *, parent_view: ServerView | None = None
+    ):
         self.irc_widget = irc_widget
-        self.view_id = irc_widget.view_selector.insert(parent_view_id, "end", text=name)
+        self._parent_view = parent_view
+        self.view_id: str = irc_widget.view_selector.insert(
+            "" if parent_view is None else parent_view.view_id, "end", text=name
+        )
         self._name = name
         self.notification_count = 0
         self._biberao_notification_timers: list[str] = []
+        self._contextmenu: tkinter.Menu | None = None
+        # Same as the tags of the view in the view selector, without asking Tcl
+        self._view_selector_tag: Literal["new_message", "pinged"] | None = None
+        # Adding many messages at once scrolls down only once
+        self._scroll_to_end_timeout_id: str | None = None
 
         self.textwidget = tkinter.Text(
-            irc_widget.textwidget_container,
+            irc_widget.textwidget_frame,
             width=1,  # minimum, can stretch bigger
             height=1,  # minimum, can stretch bigger
             border=1,
@@ -215,6 +319,10 @@ class View:
             takefocus=True,
             tabs=(150, "right", 160, "left"),
         )
+        # Hidden until this view is selected, see IrcWidget._current_view_changed()
+        self.textwidget.grid(row=0, column=0, sticky="nsew")
+        self.textwidget.grid_remove()
+
         # TODO: a vertical line you can drag, like in hexchat
         self.textwidget.tag_config("text", lmargin2=160)
         textwidget_tags.config_tags(
@@ -310,25 +418,41 @@ class View:
         self._update_view_selector()
         self.irc_widget.event_generate("<<NotificationCountChanged>>")
 
-        old_tags = set(self.irc_widget.view_selector.item(self.view_id, "tags"))
-        self.irc_widget.view_selector.item(
-            self.view_id, tags=list(old_tags - {"new_message", "pinged"})
-        )
+        if self._view_selector_tag is not None:
+            self._view_selector_tag = None
+            self.irc_widget.view_selector.item(self.view_id, tags=[])
 
     def add_view_selector_tag(self, tag: Literal["new_message", "pinged"]) -> None:
+        # Adding tag does not unping
+        if self._view_selector_tag in (tag, "pinged"):
+            return
         if self.irc_widget.get_current_view() == self:
             return
 
-        old_tags = set(self.irc_widget.view_selector.item(self.view_id, "tags"))
-        if "pinged" in old_tags:  # Adding tag does not unping
-            return
+        self._view_selector_tag = tag
+        self.irc_widget.view_selector.item(self.view_id, tags=[tag])
 
-        self.irc_widget.view_selector.item(
-            self.view_id, tags=list((old_tags - {"new_message", "pinged"}) | {tag})
-        )
+    def _scroll_to_end(self) -> None:
+        self._scroll_to_end_timeout_id = None
+        self.textwidget.see("end")
 
     def destroy_widgets(self) -> None:
+        if self._scroll_to_end_timeout_id is not None:
+            self.textwidget.after_cancel(self._scroll_to_end_timeout_id)
         self.textwidget.destroy()
+        if self._contextmenu is not None:
+            self._contextmenu.destroy()
+
+    def _create_contextmenu(self) -> tkinter.Menu:
+        raise NotImplementedError
+
+    # Shown when the view is right-clicked in the view selector.
+    # Created when needed, because most views are never right-clicked.
+    @property
+    def contextmenu(self) -> tkinter.Menu:
+        if self._contextmenu is None:
+            self._contextmenu = self._create_contextmenu()
+        return self._contextmenu
 
     # for tests
     def get_text(self) -> str:
@@ -336,10 +460,8 @@ class View:
 
     @property
     def server_view(self) -> ServerView:
-        parent_id = self.irc_widget.view_selector.parent(self.view_id)
-        parent_view = self.irc_widget.views_by_id[parent_id]
-        assert isinstance(parent_view, ServerView)
-        return parent_view
+        assert self._parent_view is not None
+        return self._parent_view
 
     def add_message(
         self,
@@ -357,7 +479,10 @@ class View:
 
         if show_in_gui:
             # scroll down all the way if the user hasn't scrolled up manually
-            do_the_scroll = self.textwidget.yview()[1] == 1.0
+            do_the_scroll = (
+                self._scroll_to_end_timeout_id is not None
+                or self.textwidget.yview()[1] == 1.0
+            )
 
             if history_id is not None:
                 # Without gravity, the mark stays at the end as text is inserted
@@ -377,7 +502,7 @@ class View:
                 insert_args: list[Any] = []
                 for part in message:
                     insert_args.append(part.text)
-                    insert_args.append(part.tags + ["text", tag])
+                    insert_args.append((*part.tags, "text", tag))
                 self.textwidget.insert("end", *insert_args)
 
             self.textwidget.insert("end", "\n")
@@ -391,8 +516,10 @@ class View:
 
             textwidget_tags.find_and_tag_urls(self.textwidget, start, "end")
 
-            if do_the_scroll:
-                self.textwidget.see("end")
+            if do_the_scroll and self._scroll_to_end_timeout_id is None:
+                self._scroll_to_end_timeout_id = self.textwidget.after_idle(
+                    self._scroll_to_end
+                )
 
         if self.log_file is not None:
             print(
@@ -401,7 +528,6 @@ class View:
                 "".join(part.text for part in message),
                 sep="\t",
                 file=self.log_file,
-                flush=True,
             )
 
 
@@ -424,6 +550,26 @@ class ServerView(View):
         # server tells us that it successfully marked the user as away.
         self.last_away_status: str | None = None
 
+        # Channel views whose user list contains each nick. Makes it fast to
+        # find the views affected by e.g. a QUIT, even with lots of channels.
+        self.channel_views_by_nick: dict[str, set[ChannelView]] = {}
+
+        # Subviews by lowercased channel name or nick, for find_channel() and find_pm()
+        self.channel_views_by_name: dict[str, ChannelView] = {}
+        self.pm_views_by_nick: dict[str, PMView] = {}
+
+        # NAMES and topic received so far for channels that are being joined
+        self.joins_in_progress: dict[str, received.JoinInProgress] = {}
+
+        # While waiting for a response to a WHO, don't send another WHO.
+        # This prevents the server from deciding to disconnect because it's
+        # being asked to send a lot of data quickly. None means no WHO is pending.
+        self.pending_who_sends: collections.deque[str] | None = None
+
+        # Return values of get_subviews(), keyed by include_server.
+        # IrcWidget clears this whenever subviews are added, removed or moved.
+        self.subviews_cache: dict[bool, list[View]] = {}
+
     def _run_core(self) -> None:
         self.core.run_one_step()
 
@@ -442,6 +588,9 @@ class ServerView(View):
     def start_running(self) -> None:
         self._run_core()
 
+    def _create_contextmenu(self) -> tkinter.Menu:
+        return create_server_view_menu(self)
+
     def get_log_name(self) -> str:
         # Log to file named logs/foobar/server.log.
         #
@@ -459,31 +608,24 @@ class ServerView(View):
         )
         return self.settings.join_leave_hiding["show_by_default"] ^ is_exceptional
 
+    # Don't mutate the returned list.
     def get_subviews(self, *, include_server: bool = False) -> list[View]:
-        result: list[View] = []
-        if include_server:
-            result.append(self)
-        for view_id in self.irc_widget.view_selector.get_children(self.view_id):
-            result.append(self.irc_widget.views_by_id[view_id])
+        result = self.subviews_cache.get(include_server)
+        if result is None:
+            views_by_id = self.irc_widget.views_by_id
+            result = [self] if include_server else []
+            result += [
+                views_by_id[view_id]
+                for view_id in self.irc_widget.get_child_view_ids(self.view_id)
+            ]
+            self.subviews_cache[include_server] = result
         return result
 
     def find_channel(self, name: str) -> ChannelView | None:
-        for view in self.get_subviews():
-            if (
-                isinstance(view, ChannelView)
-                and view.channel_name.lower() == name.lower()
-            ):
-                return view
-        return None
+        return self.channel_views_by_name.get(name.lower())
 
     def find_pm(self, nick: str) -> PMView | None:
-        for view in self.get_subviews():
-            if (
-                isinstance(view, PMView)
-                and view.nick_of_other_user.lower() == nick.lower()
-            ):
-                return view
-        return None
+        return self.pm_views_by_nick.get(nick.lower())
 
     def find_or_open_pm(self, nick: str, *, select_existing: bool = False) -> PMView:
         existing_view = self.find_pm(nick)
@@ -508,14 +650,13 @@ class ServerView(View):
 
 class ChannelView(View):
     def __init__(self, server_view: ServerView, channel_name: str, nicks: list[str]):
-        super().__init__(
-            server_view.irc_widget, channel_name, parent_view_id=server_view.view_id
-        )
+        super().__init__(server_view.irc_widget, channel_name, parent_view=server_view)
         self.irc_widget.view_selector.item(
             self.view_id, image=server_view.irc_widget.channel_image
         )
-        self.userlist = _UserList(server_view)
+        self.userlist = _UserList(self)
         self.userlist.set_nicks(nicks)
+        server_view.channel_views_by_name[channel_name.lower()] = self
 
     # Includes the '#' character(s), e.g. '#devuan' or '##learnpython'
     # Same as view_name, but only channels have this attribute, can clarify things a lot
@@ -526,26 +667,62 @@ class ChannelView(View):
     def get_log_name(self) -> str:
         return self.channel_name
 
+    def _create_contextmenu(self) -> tkinter.Menu:
+        return create_channel_view_menu(self)
+
+    def toggle_autojoin(self) -> None:
+        joined_channels = self.server_view.settings.joined_channels
+        if self.channel_name in joined_channels:
+            joined_channels.remove(self.channel_name)
+        else:
+            joined_channels.append(self.channel_name)
+            self.irc_widget.sort_settings_according_to_gui()
+        self.irc_widget.save_settings_soon()
+
+    def toggle_extra_notifications(self) -> None:
+        self.server_view.settings.extra_notifications ^= {self.channel_name}
+        self.irc_widget.save_settings_soon()
+
+    def part(self) -> None:
+        self.server_view.core.send(f"PART {self.channel_name}")
+
     def destroy_widgets(self) -> None:
         super().destroy_widgets()
-        self.userlist.treeview.destroy()
+        self.userlist.destroy()
+        del self.server_view.channel_views_by_name[self.channel_name.lower()]
 
 
 # PM = private messages, also known as DM = direct messages
 class PMView(View):
     def __init__(self, server_view: ServerView, nick: str):
-        super().__init__(
-            server_view.irc_widget, nick, parent_view_id=server_view.view_id
-        )
+        super().__init__(server_view.irc_widget, nick, parent_view=server_view)
         self.irc_widget.view_selector.item(
             self.view_id, image=server_view.irc_widget.pm_image
         )
+        server_view.pm_views_by_nick[nick.lower()] = self
 
     # Same as view_name, but only PM views have this attribute
-    # Do not set view_name directly, if you want log file name to update too
+    # Do not set view_name directly, use set_nick_of_other_user() instead
     @property
     def nick_of_other_user(self) -> str:
         return self.view_name
 
+    # Call this when the other user changes their nick
+    def set_nick_of_other_user(self, new_nick: str) -> None:
+        del self.server_view.pm_views_by_nick[self.nick_of_other_user.lower()]
+        self.server_view.pm_views_by_nick[new_nick.lower()] = self
+        self.view_name = new_nick
+        self.reopen_log_file()
+
     def get_log_name(self) -> str:
         return self.nick_of_other_user
+
+    def _create_contextmenu(self) -> tkinter.Menu:
+        return create_pm_view_menu(self)
+
+    def whois(self) -> None:
+        self.server_view.core.send(f"WHOIS {self.nick_of_other_user}")
+
+    def destroy_widgets(self) -> None:
+        super().destroy_widgets()
+        del self.server_view.pm_views_by_nick[self.nick_of_other_user.lower()]
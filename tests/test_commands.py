@@ -242,6 +242,7 @@ def test_nickserv(alice, bob, wait_until):
     wait_until(lambda: "IdEnTiFy ********\n" in alice.text())
     assert "hunter2" not in alice.text()
 
+    alice.log_manager.flush_all()  # otherwise flushed once a second
     text = (alice.log_manager.log_dir / "localhost" / "nickserv.log").read_text("utf-8")
     assert "IdEnTiFy ********" in text
     assert "hunter2" not in text
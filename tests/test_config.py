@@ -8,7 +8,6 @@ from tkinter.font import Font
 
 import pytest
 
-from mantaray import right_click_menus
 from mantaray.config import ServerSettings, Settings, show_connection_settings_dialog
 
 
@@ -142,7 +141,7 @@ def test_multiple_servers(alice, bob, mocker, monkeypatch, wait_until):
     mocker.patch("tkinter.Menu.tk_popup")
     alice.on_view_selector_right_click(event)
     monkeypatch.setattr("tkinter.Toplevel.wait_window", dialog_callback)
-    right_click_menus.get_menu(clear=False).invoke("Connect to a new server...")
+    alice.empty_view_selector_menu.invoke("Connect to a new server...")
 
     wait_until(lambda: len(alice.get_server_views()) == 2)
     wait_until(
@@ -161,11 +160,11 @@ def test_multiple_servers(alice, bob, mocker, monkeypatch, wait_until):
     assert alice.settings.save.call_count == 0
 
     alice.move_view_up()
-    assert alice.settings.save.call_count == 1
+    wait_until(lambda: alice.settings.save.call_count == 1)
     assert [s.nick for s in alice.settings.servers] == ["Alice2", "Alice"]
 
     alice.move_view_down()
-    assert alice.settings.save.call_count == 2
+    wait_until(lambda: alice.settings.save.call_count == 2)
     assert [s.nick for s in alice.settings.servers] == ["Alice", "Alice2"]
 
     alice.view_selector.selection_set(old_view_id)
@@ -181,7 +180,7 @@ def test_multiple_servers(alice, bob, mocker, monkeypatch, wait_until):
 
     # Leave the server by clicking that option in the right-click menu
     askyesno = mocker.patch("tkinter.messagebox.askyesno", return_value=True)
-    right_click_menus.get_menu(clear=False).invoke("Leave this server")
+    alice.get_server_views()[1].contextmenu.invoke("Leave this server")
     askyesno.assert_called_once()
     assert askyesno.call_args.kwargs["detail"] == (
         "You can reconnect later, but if you decide to do so, Mantaray won't"
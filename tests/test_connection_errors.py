@@ -6,6 +6,8 @@ import time
 
 import pytest
 
+from mantaray import received
+
 
 @pytest.mark.skipif(
     os.environ["IRC_SERVER"] == "hircd",
@@ -159,3 +161,21 @@ def test_server_dies(alice, bob, irc_server, monkeypatch, wait_until):
     # Alice is no longer marked as away: the server doesn't remember that
     # when reconnecting, so we don't pretend that it does.
     assert alice.nickbutton["text"] == "Alice"
+
+
+# base64 of "\0alice12\0" is "AGFsaWNlMTIA", and "xxx" becomes "eHh4"
+@pytest.mark.parametrize(
+    "password, expected_lines",
+    [
+        ("xxx", ["AUTHENTICATE AGFsaWNlMTIAeHh4"]),
+        # 400 bytes of base64 must be followed by an empty chunk
+        ("xxx" * 97, ["AUTHENTICATE AGFsaWNlMTIA" + "eHh4" * 97, "AUTHENTICATE +"]),
+        ("xxx" * 98, ["AUTHENTICATE AGFsaWNlMTIA" + "eHh4" * 97, "AUTHENTICATE eHh4"]),
+    ],
+)
+def test_sasl_authenticate_chunks(mocker, password, expected_lines):
+    server_view = mocker.MagicMock()
+    server_view.settings.username = "alice12"
+    server_view.settings.password = password
+    received._handle_authenticate(server_view)
+    assert [c.args[0] for c in server_view.core.send.call_args_list] == expected_lines
@@ -1,7 +1,10 @@
 import os
+import typing
 
 import pytest
 
+from mantaray import backend, received
+
 
 def test_basic(alice, bob, wait_until):
     alice.entry.insert(0, "Hello there")
@@ -230,3 +233,9 @@ def test_nickname_in_url_not_tagged(alice, bob, wait_until):
         tags = alice.get_current_view().textwidget.tag_names(middle_of_nick)
         # no self-nick or other-nick tag
         assert set(tags) == {"url", "privmsg", "text"}
+
+
+# handle_event() looks up handlers from a dict, so mypy can't check that all
+# event types are handled
+def test_every_event_type_has_a_handler():
+    assert set(received._EVENT_HANDLERS) == set(typing.get_args(backend.IrcEvent))